@@ -1,31 +1,234 @@
 from fastapi import FastAPI, HTTPException, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordBearer
+from fastapi.responses import StreamingResponse, FileResponse
+from fastapi.routing import APIRoute
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from passlib.context import CryptContext
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
 from typing import Optional, List
-import sqlite3
+from urllib.parse import parse_qsl
+from contextvars import ContextVar
+from contextlib import asynccontextmanager
+import sqlite3, json, zipfile, base64, binascii, os, gzip, hashlib, threading, time
+import sys, functools, inspect, random, secrets
 
 SECRET_KEY        = "viberevive-super-secret-key-change-in-production"
 ALGORITHM         = "HS256"
 TOKEN_EXPIRE_DAYS = 30
-DB_PATH           = "viberevive.db"
+DB_PATH           = os.getenv("VIBEREVIVE_DB", "viberevive.db")
+ADMIN_EMAILS      = {e.strip().lower() for e in os.getenv("VIBEREVIVE_ADMINS", "").split(",") if e.strip()}
 
-app = FastAPI(title="VibeRevive API")
+BACKUP_DIR            = "backups"
+BACKUP_KEEP           = 7      # snapshots kept; oldest pruned first
+BACKUP_INTERVAL_HOURS = 24     # 0 disables the scheduled backup
+BACKUP_STEP_PAGES     = 64     # pages copied per backup step
+BACKUP_STEP_SLEEP     = 0.02   # seconds handed back to the API between steps
+
+BATCH_MAX_REQUESTS = 10
+
+PROFILE_DIR         = "profiles"
+PROFILE_KEEP        = 50       # recent profiles kept on disk / listed
+PROFILE_INTERVAL    = 0.001    # stack sampling period, seconds
+PROFILE_SAMPLE_RATE = float(os.getenv("VIBEREVIVE_PROFILE_SAMPLE_RATE", "0"))   # 0..1 of all requests
+
+@asynccontextmanager
+async def lifespan(app):
+    if BACKUP_INTERVAL_HOURS > 0:
+        threading.Thread(target=backup_scheduler, daemon=True).start()
+    yield
+
+app = FastAPI(title="VibeRevive API", lifespan=lifespan)
 app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
 
 pwd_context   = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
-def get_db():
-    conn = sqlite3.connect(DB_PATH)
+def get_db(cross_thread=False):
+    # cross_thread: connection is driven from a streaming generator, whose steps
+    # Starlette runs on whichever threadpool worker is free
+    shared = batch_conn.get()
+    if shared and not cross_thread: return shared
+    conn = sqlite3.connect(DB_PATH, check_same_thread=not cross_thread,
+                           factory=ProfiledConnection if current_profile.get() else sqlite3.Connection)
     conn.row_factory = sqlite3.Row
     return conn
 
+# Inside /batch every sub-request gets the batch's connection; their commit()/close() are left to the batch
+batch_conn = ContextVar("batch_conn", default=None)
+
+class SharedConnection:
+    def __init__(self, conn): self.conn = conn
+    def __getattr__(self, name): return getattr(self.conn, name)
+    def commit(self): pass
+    def close(self):  pass
+
+# ── Request profiling (opt-in, see /admin/profiles) ───────────────────
+current_profile = ContextVar("current_profile", default=None)
+profiles_lock   = threading.Lock()
+
+class ProfiledCursor(sqlite3.Cursor):
+    """Charges execute + fetch wall time to the active request profile, keyed by SQL text."""
+    def _timed(self, fn, *args, first=False):
+        t0 = time.perf_counter()
+        try: return fn(*args)
+        finally:
+            prof = current_profile.get()
+            if prof: prof.sql.append((self._sql, t0, time.perf_counter(), first))
+    def execute(self, sql, params=()):
+        self._sql = " ".join(sql.split())
+        return self._timed(super().execute, sql, params, first=True)
+    def fetchone(self):             return self._timed(super().fetchone)
+    def fetchmany(self, size=None): return self._timed(super().fetchmany, self.arraysize if size is None else size)
+    def fetchall(self):             return self._timed(super().fetchall)
+    def __next__(self):             return self._timed(super().__next__)
+
+class ProfiledConnection(sqlite3.Connection):
+    # Connection.execute builds its cursor in C without going through cursor(), so route it explicitly
+    def cursor(self, factory=ProfiledCursor): return super().cursor(factory)
+    def execute(self, sql, params=()):        return self.cursor().execute(sql, params)
+
+class RequestProfile:
+    def __init__(self, method, path, reason):
+        self.id, self.method, self.path, self.reason = f"{datetime.utcnow():%Y%m%dT%H%M%S}-{secrets.token_hex(3)}", method, path, reason
+        self.started_at = datetime.utcnow().isoformat()
+        self.t0 = time.perf_counter(); self.t1 = None
+        self.sql     = []   # (statement, start, end, is_execute) — fetches are charged to their statement too
+        self.stacks  = {}   # tuple of frame names -> seconds
+        self.threads = set()
+        self.done    = threading.Event()
+        self.sampler = threading.Thread(target=self.sample, daemon=True)
+
+    def sample(self):
+        # Wall-clock sampling of whichever worker threads are running this request's endpoint
+        last = time.perf_counter()
+        while not self.done.wait(PROFILE_INTERVAL):
+            now = time.perf_counter(); frames = sys._current_frames()
+            for tid in list(self.threads):
+                f, stack = frames.get(tid), []
+                while f and f.f_code is not profiled_call.__code__:
+                    stack.append(f"{f.f_code.co_name} ({os.path.basename(f.f_code.co_filename)}:{f.f_code.co_firstlineno})")
+                    f = f.f_back
+                if stack:
+                    key = tuple(reversed(stack)); self.stacks[key] = self.stacks.get(key, 0) + now - last
+            last = now
+
+    def finish(self):
+        self.t1 = time.perf_counter(); self.done.set(); self.sampler.join()
+
+    def sql_totals(self):
+        totals = {}
+        for stmt, a, b, first in self.sql:
+            n, t = totals.get(stmt, (0, 0.0)); totals[stmt] = (n + first, t + b - a)
+        return sorted(totals.items(), key=lambda kv: -kv[1][1])
+
+    def summary(self):
+        totals = self.sql_totals()
+        return {"id": self.id, "method": self.method, "path": self.path, "reason": self.reason,
+                "started_at": self.started_at, "wall_ms": round((self.t1 - self.t0) * 1000, 2),
+                "sql_count": sum(first for *_, first in self.sql),
+                "sql_ms": round(sum(b - a for _, a, b, _ in self.sql) * 1000, 2),
+                "top_sql": [{"sql": stmt, "count": n, "ms": round(t * 1000, 2)} for stmt, (n, t) in totals[:10]]}
+
+    def collapsed(self):
+        # Brendan Gregg folded stacks, weights in microseconds; SQL gets its own "sql;<statement>" root
+        lines  = [f"{';'.join(s)} {round(w * 1e6)}" for s, w in self.stacks.items()]
+        lines += [f"sql;{stmt.replace(';', ',')} {round(t * 1e6)}" for stmt, (n, t) in self.sql_totals()]
+        return "\n".join(lines) + "\n"
+
+    def speedscope(self):
+        frames, index = [], {}
+        def fid(name):
+            if name not in index: index[name] = len(frames); frames.append({"name": name})
+            return index[name]
+        samples = [[fid(n) for n in s] for s in self.stacks]
+        events  = []
+        for stmt, a, b, _ in self.sql:
+            i = fid(f"SQL: {stmt}")
+            events += [{"type": "O", "frame": i, "at": a - self.t0}, {"type": "C", "frame": i, "at": b - self.t0}]
+        end = self.t1 - self.t0
+        return {"$schema": "https://www.speedscope.app/file-format-schema.json", "exporter": "viberevive",
+                "name": f"{self.method} {self.path}", "activeProfileIndex": 0, "shared": {"frames": frames},
+                "profiles": [
+                    {"type": "sampled", "name": f"{self.method} {self.path}", "unit": "seconds",
+                     "startValue": 0, "endValue": end, "samples": samples, "weights": list(self.stacks.values())},
+                    {"type": "evented", "name": "SQL via get_db", "unit": "seconds",
+                     "startValue": 0, "endValue": end, "events": events}]}
+
+PROFILE_FILES = {"summary": "summary.json", "speedscope": "speedscope.json", "collapsed": "collapsed.txt"}
+
+def profile_path(pid, fmt):
+    return os.path.join(PROFILE_DIR, f"{pid}.{PROFILE_FILES[fmt]}")
+
+def list_profile_ids():
+    # Newest first, straight from PROFILE_DIR so profiles survive restarts; call under profiles_lock
+    if not os.path.isdir(PROFILE_DIR): return []
+    ids = [n[:-len(".summary.json")] for n in os.listdir(PROFILE_DIR) if n.endswith(".summary.json")]
+    return sorted(ids, key=lambda pid: os.path.getmtime(profile_path(pid, "summary")), reverse=True)
+
+def save_profile(prof):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    with open(profile_path(prof.id, "speedscope"), "w") as f: json.dump(prof.speedscope(), f)
+    with open(profile_path(prof.id, "collapsed"), "w") as f: f.write(prof.collapsed())
+    with profiles_lock:
+        with open(profile_path(prof.id, "summary"), "w") as f: json.dump(prof.summary(), f)   # written last: marks it complete
+        for old in list_profile_ids()[PROFILE_KEEP:]:
+            for fmt in PROFILE_FILES:
+                try: os.remove(profile_path(old, fmt))
+                except FileNotFoundError: pass
+
+def profile_reason(scope):
+    for k, v in scope["headers"]:
+        if k == b"x-profile-token":
+            try: ok = jwt.decode(v.decode(), SECRET_KEY, algorithms=[ALGORITHM]).get("scope") == "profile"
+            except JWTError: ok = False
+            return "header" if ok else None
+    if PROFILE_SAMPLE_RATE and random.random() < PROFILE_SAMPLE_RATE: return "sampled"
+    return None
+
+class ProfilingMiddleware:
+    """Plain ASGI middleware: unprofiled requests cost one header scan and a branch."""
+    def __init__(self, app): self.app = app
+    async def __call__(self, scope, receive, send):
+        reason = profile_reason(scope) if scope["type"] == "http" else None
+        if not reason: return await self.app(scope, receive, send)
+        prof  = RequestProfile(scope["method"], scope["path"], reason)
+        token = current_profile.set(prof); prof.sampler.start()
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": [*message.get("headers", []), (b"x-profile-id", prof.id.encode())]}
+            await send(message)
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            current_profile.reset(token); prof.finish()
+            await run_in_threadpool(save_profile, prof)
+
+def profiled_call(fn, *args, **kwargs):
+    prof = current_profile.get()
+    if prof is None: return fn(*args, **kwargs)
+    tid = threading.get_ident(); prof.threads.add(tid)
+    try: return fn(*args, **kwargs)
+    finally: prof.threads.discard(tid)
+
+class ProfiledRoute(APIRoute):
+    """Routes whose sync endpoints register their threadpool thread with the request's sampler."""
+    def __init__(self, path, endpoint, **kwargs):
+        if not inspect.iscoroutinefunction(endpoint):
+            fn = endpoint
+            @functools.wraps(fn)
+            def endpoint(*args, **kw): return profiled_call(fn, *args, **kw)
+        super().__init__(path, endpoint, **kwargs)
+
+app.router.route_class = ProfiledRoute
+app.add_middleware(ProfilingMiddleware)
+
 def init_db():
     conn = get_db()
+    # WAL: readers (exports, backups) never block writers and vice versa
+    conn.execute("PRAGMA journal_mode=WAL")
     conn.execute("""
         CREATE TABLE IF NOT EXISTS users (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -154,6 +357,38 @@ def init_db():
             UNIQUE(user_a, user_b)
         )
     """)
+    # Block checks are served from BlockIndex, which reads the whole table — drop the old lookup index
+    conn.execute("DROP INDEX IF EXISTS idx_blocked_users_blocked")
+
+    # ── User directory search (FTS5 trigram, kept in sync by triggers) ─
+    fresh_fts = not conn.execute("SELECT 1 FROM sqlite_master WHERE name='users_fts'").fetchone()
+    conn.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS users_fts USING fts5(
+            first_name, last_name, vibe_code,
+            content='users', content_rowid='id', tokenize='trigram'
+        )
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS users_fts_ai AFTER INSERT ON users BEGIN
+            INSERT INTO users_fts(rowid, first_name, last_name, vibe_code)
+            VALUES (new.id, new.first_name, new.last_name, new.vibe_code);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS users_fts_ad AFTER DELETE ON users BEGIN
+            INSERT INTO users_fts(users_fts, rowid, first_name, last_name, vibe_code)
+            VALUES ('delete', old.id, old.first_name, old.last_name, old.vibe_code);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS users_fts_au AFTER UPDATE OF first_name, last_name, vibe_code ON users BEGIN
+            INSERT INTO users_fts(users_fts, rowid, first_name, last_name, vibe_code)
+            VALUES ('delete', old.id, old.first_name, old.last_name, old.vibe_code);
+            INSERT INTO users_fts(rowid, first_name, last_name, vibe_code)
+            VALUES (new.id, new.first_name, new.last_name, new.vibe_code);
+        END
+    """)
+    if fresh_fts: conn.execute("INSERT INTO users_fts(users_fts) VALUES ('rebuild')")
 
     conn.commit()
     conn.close()
@@ -187,6 +422,34 @@ def get_current_user(token: str = Depends(oauth2_scheme)):
     if not user: raise HTTPException(status_code=401, detail="User not found")
     return dict(user)
 
+def get_admin_user(cu: dict = Depends(get_current_user)):
+    if cu["email"].lower() not in ADMIN_EMAILS: raise HTTPException(403, "Admins only")
+    return cu
+
+class BlockIndex:
+    """blocked_users held in memory in both directions, loaded on first use and updated by block/unblock."""
+    def __init__(self):
+        self.out = None; self.inc = None; self.lock = threading.Lock()   # out[a]: a blocked them, inc[a]: they blocked a
+    def load(self):
+        with self.lock:
+            if self.out is None:
+                conn = get_db(); out = {}; inc = {}
+                for r in conn.execute("SELECT user_id, blocked_id FROM blocked_users").fetchall():
+                    out.setdefault(r[0], set()).add(r[1]); inc.setdefault(r[1], set()).add(r[0])
+                conn.close()
+                self.out, self.inc = out, inc
+    def blocked(self, a, b):
+        if self.out is None: self.load()
+        return b in self.out.get(a, ()) or b in self.inc.get(a, ())
+    def add(self, a, b):
+        self.load()
+        with self.lock: self.out.setdefault(a, set()).add(b); self.inc.setdefault(b, set()).add(a)
+    def remove(self, a, b):
+        self.load()
+        with self.lock: self.out.get(a, set()).discard(b); self.inc.get(b, set()).discard(a)
+
+block_index = BlockIndex()
+
 def pub(u):
     return {
         "id": u["id"], "first_name": u["first_name"], "last_name": u["last_name"],
@@ -226,6 +489,10 @@ class SetChatBgRequest(BaseModel):
     image: str = ""
 class SetNicknameRequest(BaseModel):           # ← new
     nickname: str = ""
+class BatchSubRequest(BaseModel):
+    path: str
+class BatchRequest(BaseModel):
+    requests: List[BatchSubRequest]
 
 # ── Auth ──────────────────────────────────────────────────────────────
 @app.get("/")
@@ -296,6 +563,7 @@ def send_request(data: FriendRequestSend, cu: dict = Depends(get_current_user)):
     target = conn.execute("SELECT * FROM users WHERE vibe_code=?", (data.vibe_code.strip(),)).fetchone()
     if not target: conn.close(); raise HTTPException(404, "No user found with that VibeCode")
     if target["id"] == cu["id"]: conn.close(); raise HTTPException(400, "You can't add yourself!")
+    if block_index.blocked(cu["id"], target["id"]): conn.close(); raise HTTPException(403, "You can't add this user")
     if conn.execute("SELECT id FROM contacts WHERE user_id=? AND contact_id=?", (cu["id"], target["id"])).fetchone():
         conn.close(); raise HTTPException(400, "Already in your contacts")
     if conn.execute("SELECT id FROM friend_requests WHERE sender_id=? AND receiver_id=?", (cu["id"], target["id"])).fetchone():
@@ -326,7 +594,8 @@ def get_requests(cu: dict = Depends(get_current_user)):
         "sender_name":f"{r['first_name']} {r['last_name']}".strip(),
         "vibe_code":r["vibe_code"],"profile_image":r["profile_image"] or "",
         "profile_border":r["profile_border"] or "glow_purple",
-        "bio":r["bio"] or "","sent_at":r["sent_at"]} for r in rows]}
+        "bio":r["bio"] or "","sent_at":r["sent_at"]}
+        for r in rows if not block_index.blocked(cu["id"], r["sender_id"])]}
 
 @app.post("/friends/respond")
 def respond_request(data: FriendRequestRespond, cu: dict = Depends(get_current_user)):
@@ -335,6 +604,8 @@ def respond_request(data: FriendRequestRespond, cu: dict = Depends(get_current_u
     req = conn.execute("SELECT * FROM friend_requests WHERE id=? AND receiver_id=?",
                        (data.request_id, cu["id"])).fetchone()
     if not req: conn.close(); raise HTTPException(404, "Request not found")
+    if data.action == "accept" and block_index.blocked(cu["id"], req["sender_id"]):
+        conn.close(); raise HTTPException(403, "You can't add this user")
     if data.action == "accept":
         conn.execute("UPDATE friend_requests SET status='accepted' WHERE id=?", (data.request_id,))
         conn.execute("INSERT OR IGNORE INTO contacts (user_id,contact_id) VALUES (?,?)", (cu["id"], req["sender_id"]))
@@ -346,6 +617,28 @@ def respond_request(data: FriendRequestRespond, cu: dict = Depends(get_current_u
     conn.commit(); conn.close()
     return {"message": msg}
 
+# ── User search ───────────────────────────────────────────────────────
+@app.get("/users/search")
+def search_users(q: str, limit: int = 20, after: int = 0, cu: dict = Depends(get_current_user)):
+    # Trigram index: each word of 3+ chars must appear somewhere in first name, last name or VibeCode.
+    # Paged by rowid (pass next_cursor back as ?after=) so every page is a bounded index walk.
+    terms = [t for t in q.split() if len(t) >= 3]
+    if not terms: raise HTTPException(400, "Type at least 3 characters")
+    limit = max(1, min(limit, 50))
+    match = " ".join('"' + t.replace('"', '""') + '"' for t in terms)
+    conn = get_db()
+    rows = conn.execute("""
+        SELECT u.id, u.first_name, u.last_name, u.vibe_code, u.profile_border, u.main_vibe
+        FROM users_fts f JOIN users u ON u.id=f.rowid
+        WHERE users_fts MATCH ? AND f.rowid>? AND f.rowid!=?
+        ORDER BY f.rowid LIMIT ?
+    """, (match, after, cu["id"], limit)).fetchall()
+    conn.close()
+    return {"users": [{"id":r["id"],"name":f"{r['first_name']} {r['last_name']}".strip(),
+        "vibe_code":r["vibe_code"],"profile_border":r["profile_border"] or "glow_purple",
+        "main_vibe":r["main_vibe"] or ""} for r in rows if not block_index.blocked(cu["id"], r["id"])],
+        "next_cursor": rows[-1]["id"] if len(rows) == limit else None}
+
 # ── Contacts ──────────────────────────────────────────────────────────
 @app.get("/contacts")
 def get_contacts(cu: dict = Depends(get_current_user)):
@@ -372,6 +665,8 @@ def get_contacts(cu: dict = Depends(get_current_user)):
         FROM contacts c JOIN users u ON u.id=c.contact_id
         WHERE c.user_id=?
     """, (cu["id"],cu["id"],cu["id"],cu["id"],cu["id"],cu["id"],cu["id"],cu["id"])).fetchall()
+    # Blocking only drops the blocker's contact row — hide the pair from the other side too
+    rows = [r for r in rows if not block_index.blocked(cu["id"], r["id"])]
 
     contact_ids = {r["id"] for r in rows}
     result = []
@@ -418,7 +713,7 @@ def get_contacts(cu: dict = Depends(get_current_user)):
     ).fetchall()
 
     for r in invite_senders:
-        if r["id"] not in contact_ids:
+        if r["id"] not in contact_ids and not block_index.blocked(cu["id"], r["id"]):
             result.append({
                 "id":r["id"],"name":f"{r['first_name']} {r['last_name']}".strip(),
                 "vibe_code":r["vibe_code"],"profile_image":r["profile_image"] or "",
@@ -437,6 +732,7 @@ def get_contacts(cu: dict = Depends(get_current_user)):
 @app.post("/messages/send")
 def send_message(data: SendMessageRequest, cu: dict = Depends(get_current_user)):
     if not data.text.strip(): raise HTTPException(400, "Empty message")
+    if block_index.blocked(cu["id"], data.receiver_id): raise HTTPException(403, "You can't message this user")
     conn = get_db()
     if not conn.execute("SELECT id FROM contacts WHERE user_id=? AND contact_id=?",
                         (cu["id"], data.receiver_id)).fetchone():
@@ -541,8 +837,19 @@ def block_user(contact_id: int, cu: dict = Depends(get_current_user)):
                  (cu["id"], contact_id))
     conn.execute("DELETE FROM contacts WHERE user_id=? AND contact_id=?", (cu["id"], contact_id))
     conn.commit(); conn.close()
+    block_index.add(cu["id"], contact_id)
     return {"message": "User blocked."}
 
+# ── Unblock a user (contact is not restored — send a new request) ─────
+@app.post("/contacts/{contact_id}/unblock")
+def unblock_user(contact_id: int, cu: dict = Depends(get_current_user)):
+    conn = get_db()
+    cur = conn.execute("DELETE FROM blocked_users WHERE user_id=? AND blocked_id=?", (cu["id"], contact_id))
+    conn.commit(); conn.close()
+    if not cur.rowcount: raise HTTPException(404, "User is not blocked")
+    block_index.remove(cu["id"], contact_id)
+    return {"message": "User unblocked."}
+
 # ── Report a user ─────────────────────────────────────────────────────
 @app.post("/contacts/{contact_id}/report")
 def report_user(contact_id: int, cu: dict = Depends(get_current_user)):
@@ -554,6 +861,7 @@ def report_user(contact_id: int, cu: dict = Depends(get_current_user)):
 # ── Set / clear chat background (shared between both users) ───────────
 @app.post("/contacts/{contact_id}/background")
 def set_chat_background(contact_id: int, data: SetChatBgRequest, cu: dict = Depends(get_current_user)):
+    if block_index.blocked(cu["id"], contact_id): raise HTTPException(403, "You can't change this chat")
     conn = get_db()
     uid_a, uid_b = min(cu["id"], contact_id), max(cu["id"], contact_id)
     conn.execute("""
@@ -581,6 +889,7 @@ def create_group(data: CreateGroupRequest, cu: dict = Depends(get_current_user))
     conn.execute("INSERT INTO group_messages (group_id,sender_id,text,is_system) VALUES (?,?,?,1)",
                  (group_id, cu["id"], f"👑 {creator_name} is the owner"))
     for uid in data.invite_user_ids:
+        if block_index.blocked(cu["id"], uid): continue
         contact = conn.execute("SELECT id FROM contacts WHERE user_id=? AND contact_id=?",
                                (cu["id"], uid)).fetchone()
         if not contact: continue
@@ -656,7 +965,8 @@ def get_group_messages(group_id: int, cu: dict = Depends(get_current_user)):
             "profile_image":m["profile_image"] or "","profile_border":m["profile_border"] or "",
             "is_owner":m["id"]==m["owner_id"]} for m in members],
         "non_members": [{"id":n["id"],"name":f"{n['first_name']} {n['last_name']}".strip(),
-            "profile_image":n["profile_image"] or ""} for n in non_members],
+            "profile_image":n["profile_image"] or ""} for n in non_members
+            if not block_index.blocked(cu["id"], n["id"])],
         "group": {"id":group["id"],"name":group["name"],"image":group["image"] or "",
                   "owner_id":group["owner_id"],"created_at":group["created_at"]},
     }
@@ -729,6 +1039,7 @@ def invite_to_group(group_id: int, data: InviteToGroupRequest, cu: dict = Depend
     inviter_name = f"{cu['first_name']} {cu['last_name']}".strip()
     sent = 0
     for uid in data.user_ids:
+        if block_index.blocked(cu["id"], uid): continue
         contact = conn.execute("SELECT id FROM contacts WHERE user_id=? AND contact_id=?",
                                (cu["id"], uid)).fetchone()
         if not contact: continue
@@ -768,6 +1079,8 @@ def respond_group_invite(data: GroupInviteRespond, cu: dict = Depends(get_curren
     if not invite: conn.close(); raise HTTPException(404, "Invite not found")
     if invite["status"] != "pending":
         conn.close(); raise HTTPException(400, "Already responded to this invite")
+    if data.action == "accept" and block_index.blocked(cu["id"], invite["inviter_id"]):
+        conn.close(); raise HTTPException(403, "You can't join this group")
     if data.action == "accept":
         conn.execute("UPDATE group_invites SET status='accepted' WHERE id=?", (data.invite_id,))
         conn.execute("INSERT OR IGNORE INTO group_members (group_id,user_id,status) VALUES (?,?,'accepted')",
@@ -782,4 +1095,329 @@ def respond_group_invite(data: GroupInviteRespond, cu: dict = Depends(get_curren
 
 @app.get("/groups/invites/pending")
 def get_group_invites(cu: dict = Depends(get_current_user)):
-    return {"invites": []}
\ No newline at end of file
+    return {"invites": []}
+
+# ── Batch (several GETs, one auth / connection / snapshot) ────────────
+def run_sub_request(path, cu):
+    path, _, query = path.partition("?")
+    for route in app.routes:
+        if isinstance(route, APIRoute) and "GET" in route.methods:
+            match = route.path_regex.match(path)
+            if match: break
+    else:
+        return 404, {"detail": "Not Found"}
+    # Call the plain function: going through ProfiledRoute's wrapper again would unregister
+    # the batch's own thread from the profiler after the first sub-request
+    endpoint = getattr(route.endpoint, "__wrapped__", route.endpoint)
+    # Streaming / file routes open resources the batch would never consume — refuse before running them
+    if endpoint in (export_messages, export_group, get_profile): return 400, {"detail": "Route can't be batched"}
+    raw = {**dict(parse_qsl(query)), **match.groupdict()}
+    kwargs = {}
+    try:
+        for name, p in inspect.signature(endpoint).parameters.items():
+            dep = getattr(p.default, "dependency", None)
+            if   dep is get_current_user: kwargs[name] = cu
+            elif dep is get_admin_user:   kwargs[name] = get_admin_user(cu)
+            elif dep is not None:         return 400, {"detail": "Route can't be batched"}
+            elif name in raw:
+                try: kwargs[name] = p.annotation(raw[name]) if p.annotation in (int, float, str) else raw[name]
+                except ValueError: return 422, {"detail": f"Invalid value for {name}"}
+            elif p.default is inspect.Parameter.empty:
+                return 422, {"detail": f"Missing {name}"}
+        result = endpoint(**kwargs)
+    except HTTPException as e:
+        return e.status_code, {"detail": e.detail}
+    except sqlite3.OperationalError as e:
+        # query_only tripped: the route writes (e.g. GET /messages/{id} marks messages read)
+        if "attempt to write a readonly database" not in str(e): raise
+        return 400, {"detail": "Only read-only routes can be batched"}
+    if not isinstance(result, dict): return 400, {"detail": "Route can't be batched"}
+    return 200, result
+
+@app.post("/batch")
+def batch(data: BatchRequest, cu: dict = Depends(get_current_user)):
+    if len(data.requests) > BATCH_MAX_REQUESTS:
+        raise HTTPException(400, f"At most {BATCH_MAX_REQUESTS} requests per batch")
+    conn = get_db()
+    conn.execute("PRAGMA query_only=ON")
+    conn.execute("BEGIN")   # one read transaction = every sub-request sees the same snapshot
+    token = batch_conn.set(SharedConnection(conn))
+    try:
+        responses = []
+        for sub in data.requests:
+            status, body = run_sub_request(sub.path, cu)
+            responses.append({"path": sub.path, "status": status, "body": body})
+    finally:
+        batch_conn.reset(token); conn.rollback(); conn.close()
+    return {"responses": responses}
+
+# ── Export (streamed, constant memory) ────────────────────────────────
+EXPORT_PAGE_ROWS   = 50          # rows per keyset page — bounds memory even if every row is inline media
+EXPORT_CHUNK_BYTES = 64 * 1024   # flush to the client once this much output is buffered
+MEDIA_EXT = {"image/jpeg":"jpg","image/png":"png","image/gif":"gif","image/webp":"webp",
+             "audio/m4a":"m4a","audio/mp4":"m4a","audio/aac":"aac","audio/mpeg":"mp3","audio/wav":"wav"}
+
+DM_EXPORT_SQL = """
+    SELECT m.id, m.sender_id, m.text, m.sent_at, m.msg_type, m.group_invite_id,
+           u.first_name, u.last_name
+    FROM messages m JOIN users u ON u.id=m.sender_id
+    WHERE ((m.sender_id=? AND m.receiver_id=?) OR (m.sender_id=? AND m.receiver_id=?))
+      AND m.id>? AND m.id<=?
+    ORDER BY m.id ASC LIMIT ?
+"""
+GROUP_EXPORT_SQL = """
+    SELECT gm.id, gm.sender_id, gm.text, gm.is_system, gm.sent_at,
+           u.first_name, u.last_name
+    FROM group_messages gm JOIN users u ON u.id=gm.sender_id
+    WHERE gm.group_id=? AND gm.id>? AND gm.id<=?
+    ORDER BY gm.id ASC LIMIT ?
+"""
+
+def export_rows(conn, sql, params, max_id):
+    # Keyset pagination: each page is a short statement that finishes before we yield,
+    # so a slow download never holds a read lock that stalls senders.
+    last_id = 0
+    while True:
+        rows = conn.execute(sql, (*params, last_id, max_id, EXPORT_PAGE_ROWS)).fetchall()
+        if not rows: return
+        yield from rows
+        last_id = rows[-1]["id"]
+
+def split_data_url(text):
+    # "data:image/jpeg;base64,AAAA" -> ("image/jpeg", "AAAA")
+    if not text.startswith("data:") or ";base64," not in text[:80]: return None
+    head, b64 = text[5:].split(",", 1)
+    return head.split(";")[0], b64
+
+def media_name(row_id, mime):
+    return f"media/{row_id}.{MEDIA_EXT.get(mime, 'bin')}"
+
+class ZipSink:
+    """Write-only, unseekable file for zipfile — bytes sit here until the generator drains them."""
+    def __init__(self): self.buf = bytearray(); self.pos = 0
+    def write(self, b): self.buf += b; self.pos += len(b); return len(b)
+    def tell(self):     return self.pos
+    def flush(self):    pass
+    def drain(self):
+        out = bytes(self.buf); self.buf.clear(); return out
+
+def stream_ndjson(conn, sql, params, max_id, to_json):
+    try:
+        buf = []; size = 0
+        for r in export_rows(conn, sql, params, max_id):
+            line = (json.dumps(to_json(r), ensure_ascii=False) + "\n").encode()
+            buf.append(line); size += len(line)
+            if size >= EXPORT_CHUNK_BYTES:
+                yield b"".join(buf); buf = []; size = 0
+        if buf: yield b"".join(buf)
+    finally:
+        conn.close()
+
+def stream_zip(conn, sql, params, max_id, to_json):
+    # Two passes over the same id range: media files first, then messages.ndjson pointing at them
+    # (zipfile allows only one open entry at a time).
+    sink = ZipSink(); broken = set()
+    try:
+        with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+            for r in export_rows(conn, sql, params, max_id):
+                media = split_data_url(r["text"] or "")
+                if not media: continue
+                try:    data = base64.b64decode(media[1])
+                except binascii.Error: broken.add(r["id"]); continue
+                zf.writestr(media_name(r["id"], media[0]), data, compress_type=zipfile.ZIP_STORED)
+                del data
+                yield sink.drain()
+            with zf.open("messages.ndjson", "w", force_zip64=True) as f:
+                for r in export_rows(conn, sql, params, max_id):
+                    row   = to_json(r)
+                    media = split_data_url(row["text"] or "")
+                    if media and r["id"] not in broken: row["text"] = media_name(r["id"], media[0])
+                    f.write((json.dumps(row, ensure_ascii=False) + "\n").encode())
+                    if len(sink.buf) >= EXPORT_CHUNK_BYTES: yield sink.drain()
+        yield sink.drain()
+    finally:
+        conn.close()
+
+def export_response(conn, fmt, sql, params, max_id, to_json, filename):
+    # Sync generator → Starlette pulls the next chunk only after the previous send() has
+    # been accepted by the transport, so a slow client throttles the DB reads.
+    if fmt == "zip":
+        return StreamingResponse(stream_zip(conn, sql, params, max_id, to_json), media_type="application/zip",
+                                 headers={"Content-Disposition": f'attachment; filename="{filename}.zip"'})
+    return StreamingResponse(stream_ndjson(conn, sql, params, max_id, to_json), media_type="application/x-ndjson",
+                             headers={"Content-Disposition": f'attachment; filename="{filename}.ndjson"'})
+
+@app.get("/export/messages/{contact_id}")
+def export_messages(contact_id: int, format: str = "ndjson", cu: dict = Depends(get_current_user)):
+    if format not in ("ndjson","zip"): raise HTTPException(400, "Invalid format")
+    conn = get_db(cross_thread=True)
+    if not conn.execute("SELECT id FROM users WHERE id=?", (contact_id,)).fetchone():
+        conn.close(); raise HTTPException(404, "User not found")
+    # Pin the upper bound now so messages sent mid-download don't stretch the export forever
+    max_id = conn.execute("SELECT MAX(id) FROM messages").fetchone()[0] or 0
+    me = cu["id"]
+    def to_json(r):
+        return {"id":r["id"],"sender_id":r["sender_id"],
+                "sender_name":f"{r['first_name']} {r['last_name']}".strip(),
+                "is_me":r["sender_id"]==me,"text":r["text"],"msg_type":r["msg_type"] or "text",
+                "group_invite_id":r["group_invite_id"],"sent_at":r["sent_at"]}
+    return export_response(conn, format, DM_EXPORT_SQL, (me, contact_id, contact_id, me), max_id,
+                           to_json, f"viberevive-chat-{contact_id}")
+
+@app.get("/export/groups/{group_id}")
+def export_group(group_id: int, format: str = "ndjson", cu: dict = Depends(get_current_user)):
+    if format not in ("ndjson","zip"): raise HTTPException(400, "Invalid format")
+    conn = get_db(cross_thread=True)
+    member = conn.execute("SELECT id FROM group_members WHERE group_id=? AND user_id=? AND status='accepted'",
+                          (group_id, cu["id"])).fetchone()
+    if not member: conn.close(); raise HTTPException(403, "Not a member of this group")
+    max_id = conn.execute("SELECT MAX(id) FROM group_messages").fetchone()[0] or 0
+    me = cu["id"]
+    def to_json(r):
+        return {"id":r["id"],"sender_id":r["sender_id"],
+                "sender_name":f"{r['first_name']} {r['last_name']}".strip(),
+                "is_me":r["sender_id"]==me,"text":r["text"],"is_system":bool(r["is_system"]),
+                "sent_at":r["sent_at"]}
+    return export_response(conn, format, GROUP_EXPORT_SQL, (group_id,), max_id,
+                           to_json, f"viberevive-group-{group_id}")
+
+# ── Backups (online, stepped, gzip + sha256) ──────────────────────────
+backup_lock   = threading.Lock()
+backup_status = {"last": None, "last_error": None}
+
+def list_backups():
+    if not os.path.isdir(BACKUP_DIR): return []
+    # Oldest first by mtime — names share a second-resolution timestamp plus a random suffix
+    names = sorted((n for n in os.listdir(BACKUP_DIR)
+                    if n.endswith(".db.gz") and os.path.exists(os.path.join(BACKUP_DIR, n + ".sha256"))),
+                   key=lambda n: os.path.getmtime(os.path.join(BACKUP_DIR, n)))
+    return [{"name": n, "size": os.path.getsize(os.path.join(BACKUP_DIR, n)),
+             "created_at": datetime.utcfromtimestamp(os.path.getmtime(os.path.join(BACKUP_DIR, n))).isoformat()}
+            for n in names]
+
+def run_backup():
+    """Snapshot DB_PATH into BACKUP_DIR as <name>.db.gz plus a <name>.db.gz.sha256 of the raw DB, then prune."""
+    os.makedirs(BACKUP_DIR, exist_ok=True)
+    # Random suffix: the CLI doesn't take backup_lock, so two snapshots can land in the same second
+    name = f"viberevive-{datetime.utcnow():%Y%m%dT%H%M%SZ}-{secrets.token_hex(2)}.db.gz"
+    path = os.path.join(BACKUP_DIR, name)
+    raw  = os.path.join(BACKUP_DIR, f".{name}.raw")
+    digest = hashlib.sha256()
+    try:
+        src = sqlite3.connect(DB_PATH, isolation_level=None)
+        dst = sqlite3.connect(raw)
+        try:
+            # With WAL an open read transaction pins one snapshot without blocking writers, so the
+            # stepped copy is consistent and never restarts because someone sent a message.
+            src.execute("BEGIN"); src.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+            src.backup(dst, pages=BACKUP_STEP_PAGES, progress=lambda *_: time.sleep(BACKUP_STEP_SLEEP))
+            src.execute("COMMIT")
+            dst.execute("PRAGMA journal_mode=DELETE")   # self-contained file, no -wal sidecar
+        finally:
+            src.close(); dst.close()
+        with open(raw, "rb") as fin, gzip.open(path + ".part", "wb") as fout:
+            for chunk in iter(lambda: fin.read(1 << 20), b""):
+                digest.update(chunk); fout.write(chunk)
+        with open(path + ".sha256", "w") as f: f.write(f"{digest.hexdigest()}  {name[:-3]}\n")
+        os.replace(path + ".part", path)
+    finally:
+        # Dotfile / .part leftovers are invisible to list_backups, so retention would never reclaim them
+        for leftover in (raw, path + ".part"):
+            try: os.remove(leftover)
+            except FileNotFoundError: pass
+    for old in list_backups()[:-BACKUP_KEEP]:
+        for suffix in ("", ".sha256"):
+            try: os.remove(os.path.join(BACKUP_DIR, old["name"] + suffix))
+            except FileNotFoundError: pass
+    return name
+
+def verify_backup(path):
+    """Restore a snapshot into a scratch file and check its checksum, integrity and schema."""
+    report  = {"name": os.path.basename(path), "ok": False}
+    scratch = path + ".verify"
+    try:
+        with open(path + ".sha256") as f: expected = f.read().split()[0]
+        digest = hashlib.sha256()
+        with gzip.open(path, "rb") as fin, open(scratch, "wb") as fout:
+            for chunk in iter(lambda: fin.read(1 << 20), b""):
+                digest.update(chunk); fout.write(chunk)
+        conn = sqlite3.connect(scratch)
+        try:
+            report["integrity"] = conn.execute("PRAGMA integrity_check").fetchone()[0]
+            tables = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+            report["missing_tables"] = sorted({"users","contacts","messages","groups","group_messages"} - tables)
+            if not report["missing_tables"]:
+                report["users"]    = conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+                report["messages"] = conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+        finally:
+            conn.close()
+        report["checksum_ok"] = digest.hexdigest() == expected
+        report["ok"] = report["checksum_ok"] and report["integrity"] == "ok" and not report["missing_tables"]
+    except (OSError, EOFError, IndexError, sqlite3.DatabaseError) as e:
+        report["error"] = str(e)
+    finally:
+        if os.path.exists(scratch): os.remove(scratch)
+    return report
+
+def backup_job():
+    if not backup_lock.acquire(blocking=False): return
+    try:
+        backup_status["last"] = run_backup(); backup_status["last_error"] = None
+    except Exception as e:
+        backup_status["last_error"] = str(e)
+    finally:
+        backup_lock.release()
+
+def backup_scheduler():
+    while True:
+        time.sleep(BACKUP_INTERVAL_HOURS * 3600)
+        backup_job()
+
+@app.post("/admin/backups", status_code=202)
+def trigger_backup(admin: dict = Depends(get_admin_user)):
+    if backup_lock.locked(): raise HTTPException(409, "A backup is already running")
+    threading.Thread(target=backup_job, daemon=True).start()
+    return {"message": "Backup started."}
+
+@app.get("/admin/backups")
+def get_backups(admin: dict = Depends(get_admin_user)):
+    return {"backups": list_backups(), "running": backup_lock.locked(), **backup_status}
+
+@app.post("/admin/backups/{name}/verify")
+def verify_backup_endpoint(name: str, admin: dict = Depends(get_admin_user)):
+    if name not in {b["name"] for b in list_backups()}: raise HTTPException(404, "Backup not found")
+    return verify_backup(os.path.join(BACKUP_DIR, name))
+
+# ── Profiles ──────────────────────────────────────────────────────────
+@app.post("/admin/profiles/token")
+def create_profile_token(admin: dict = Depends(get_admin_user)):
+    # No "sub" claim, so this token can switch profiling on but never authenticates as anyone
+    payload = {"scope": "profile", "by": admin["email"], "exp": datetime.utcnow() + timedelta(hours=1)}
+    return {"header": "X-Profile-Token", "token": jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)}
+
+@app.get("/admin/profiles")
+def get_profiles(admin: dict = Depends(get_admin_user)):
+    with profiles_lock:
+        summaries = []
+        for pid in list_profile_ids():
+            with open(profile_path(pid, "summary")) as f: summaries.append(json.load(f))
+    return {"profiles": summaries}
+
+@app.get("/admin/profiles/{profile_id}")
+def get_profile(profile_id: str, format: str = "speedscope", admin: dict = Depends(get_admin_user)):
+    if format not in ("speedscope","collapsed"): raise HTTPException(400, "Invalid format")
+    with profiles_lock: known = profile_id in list_profile_ids()
+    if not known: raise HTTPException(404, "Profile not found")
+    return FileResponse(profile_path(profile_id, format), filename=os.path.basename(profile_path(profile_id, format)),
+                        media_type="application/json" if format == "speedscope" else "text/plain")
+
+if __name__ == "__main__":
+    # python main.py backup                      — take a snapshot now
+    # python main.py verify-backup <file.db.gz>  — restore-test a snapshot, exit 1 if bad
+    if sys.argv[1:2] == ["backup"]:
+        print(run_backup())
+    elif sys.argv[1:2] == ["verify-backup"] and len(sys.argv) == 3:
+        result = verify_backup(sys.argv[2])
+        print(json.dumps(result, indent=2)); sys.exit(0 if result["ok"] else 1)
+    else:
+        print("usage: python main.py backup | verify-backup <file.db.gz>"); sys.exit(2)
@@ -0,0 +1,181 @@
+import os, sqlite3, tempfile
+
+# main runs init_db() at import time — keep it off the real viberevive.db
+os.environ.setdefault("VIBEREVIVE_DB", os.path.join(tempfile.mkdtemp(), "import.db"))
+
+import pytest
+from fastapi.testclient import TestClient
+import main
+
+# a_blocks_b: Ann is the blocker; b_blocks_a: Ann is the one blocked. Every check runs both ways.
+DIRECTIONS = ["a_blocks_b", "b_blocks_a"]
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "DB_PATH", str(tmp_path / "test.db"))
+    monkeypatch.setattr(main, "block_index", main.BlockIndex())
+    main.init_db()
+    return TestClient(main.app)
+
+def register(client, first, last):
+    r = client.post("/register", json={"first_name": first, "last_name": last,
+                                       "email": f"{first.lower()}@test.com", "password": "password123"})
+    assert r.status_code == 200, r.text
+    return {**r.json()["user"], "auth": {"Authorization": f"Bearer {r.json()['token']}"}}
+
+def connect(client, x, y):
+    client.post("/friends/request", json={"vibe_code": y["vibe_code"]}, headers=x["auth"])
+    assert client.post("/friends/request", json={"vibe_code": x["vibe_code"]}, headers=y["auth"]).json()["auto_accepted"]
+
+def block(client, direction, a, b):
+    blocker, target = (a, b) if direction == "a_blocks_b" else (b, a)
+    assert client.post(f"/contacts/{target['id']}/block", headers=blocker["auth"]).status_code == 200
+    return blocker, target
+
+def db_rows(sql, *params):
+    conn = sqlite3.connect(main.DB_PATH)
+    rows = conn.execute(sql, params).fetchall()
+    conn.close()
+    return rows
+
+@pytest.fixture
+def people(client):
+    ann, bob, cat = register(client, "Ann", "Lee"), register(client, "Bob", "Ray"), register(client, "Cat", "Orr")
+    connect(client, ann, bob); connect(client, ann, cat); connect(client, bob, cat)
+    return ann, bob, cat
+
+# ── Write paths ───────────────────────────────────────────────────────
+@pytest.mark.parametrize("direction", DIRECTIONS)
+def test_send_message_refused_both_ways(client, people, direction):
+    ann, bob, cat = people
+    block(client, direction, ann, bob)
+    for x, y in ((ann, bob), (bob, ann)):
+        r = client.post("/messages/send", json={"receiver_id": y["id"], "text": "hi"}, headers=x["auth"])
+        assert r.status_code == 403
+    assert client.post("/messages/send", json={"receiver_id": cat["id"], "text": "hi"}, headers=ann["auth"]).status_code == 200
+
+@pytest.mark.parametrize("direction", DIRECTIONS)
+def test_send_request_refused_both_ways(client, people, direction):
+    ann, bob, _ = people
+    block(client, direction, ann, bob)
+    for x, y in ((ann, bob), (bob, ann)):
+        assert client.post("/friends/request", json={"vibe_code": y["vibe_code"]}, headers=x["auth"]).status_code == 403
+
+@pytest.mark.parametrize("direction", DIRECTIONS)
+def test_accept_request_refused_and_request_hidden(client, people, direction):
+    ann = people[0]
+    dan = register(client, "Dan", "Fox")
+    client.post("/friends/request", json={"vibe_code": ann["vibe_code"]}, headers=dan["auth"])
+    request_id = client.get("/friends/requests", headers=ann["auth"]).json()["requests"][0]["id"]
+    block(client, direction, ann, dan)
+    assert client.get("/friends/requests", headers=ann["auth"]).json()["requests"] == []
+    r = client.post("/friends/respond", json={"request_id": request_id, "action": "accept"}, headers=ann["auth"])
+    assert r.status_code == 403
+    assert not db_rows("SELECT id FROM contacts WHERE user_id=? AND contact_id=?", ann["id"], dan["id"])
+
+@pytest.mark.parametrize("direction", DIRECTIONS)
+def test_accept_group_invite_refused(client, people, direction):
+    ann, bob, _ = people
+    group_id = client.post("/groups/create", json={"name": "Squad", "invite_user_ids": [ann["id"]]},
+                           headers=bob["auth"]).json()["group"]["id"]
+    invite_id = db_rows("SELECT id FROM group_invites WHERE group_id=? AND invitee_id=?", group_id, ann["id"])[0][0]
+    block(client, direction, ann, bob)
+    r = client.post("/groups/invites/respond", json={"invite_id": invite_id, "action": "accept"}, headers=ann["auth"])
+    assert r.status_code == 403
+    assert not db_rows("SELECT id FROM group_members WHERE group_id=? AND user_id=?", group_id, ann["id"])
+    assert not db_rows("SELECT id FROM group_messages WHERE group_id=? AND sender_id=?", group_id, ann["id"])
+
+@pytest.mark.parametrize("direction", DIRECTIONS)
+def test_chat_background_refused_both_ways(client, people, direction):
+    ann, bob, _ = people
+    block(client, direction, ann, bob)
+    for x, y in ((ann, bob), (bob, ann)):
+        assert client.post(f"/contacts/{y['id']}/background", json={"image": ""}, headers=x["auth"]).status_code == 403
+
+@pytest.mark.parametrize("direction", DIRECTIONS)
+def test_create_group_skips_blocked_invitee(client, people, direction):
+    ann, bob, cat = people
+    block(client, direction, ann, bob)
+    for owner, other in ((ann, bob), (bob, ann)):
+        r = client.post("/groups/create", json={"name": "Squad", "invite_user_ids": [other["id"], cat["id"]]},
+                        headers=owner["auth"])
+        invitees = [row[0] for row in db_rows("SELECT invitee_id FROM group_invites WHERE group_id=?", r.json()["group"]["id"])]
+        assert invitees == [cat["id"]]
+
+@pytest.mark.parametrize("direction", DIRECTIONS)
+def test_invite_to_group_skips_blocked_invitee(client, people, direction):
+    ann, bob, cat = people
+    block(client, direction, ann, bob)
+    for owner, other in ((ann, bob), (bob, ann)):
+        group_id = client.post("/groups/create", json={"name": "Squad"}, headers=owner["auth"]).json()["group"]["id"]
+        assert client.post(f"/groups/{group_id}/invite", json={"user_ids": [other["id"]]}, headers=owner["auth"]).status_code == 400
+        r = client.post(f"/groups/{group_id}/invite", json={"user_ids": [other["id"], cat["id"]]}, headers=owner["auth"])
+        assert r.json()["message"] == "Invited 1 person(s)!"
+        assert not db_rows("SELECT id FROM group_invites WHERE group_id=? AND invitee_id=?", group_id, other["id"])
+
+# ── List paths ────────────────────────────────────────────────────────
+@pytest.mark.parametrize("direction", DIRECTIONS)
+def test_contacts_hidden_from_both_sides(client, people, direction):
+    ann, bob, cat = people
+    block(client, direction, ann, bob)
+    assert [c["id"] for c in client.get("/contacts", headers=ann["auth"]).json()["contacts"]] == [cat["id"]]
+    assert [c["id"] for c in client.get("/contacts", headers=bob["auth"]).json()["contacts"]] == [cat["id"]]
+
+@pytest.mark.parametrize("direction", DIRECTIONS)
+def test_group_invite_sender_hidden_from_contacts(client, people, direction):
+    ann, bob, cat = people
+    # Bob's invite message makes him show up for Ann via the invite-sender list even without a contact row
+    client.post("/groups/create", json={"name": "Squad", "invite_user_ids": [ann["id"]]}, headers=bob["auth"])
+    client.post("/groups/create", json={"name": "Crew", "invite_user_ids": [bob["id"]]}, headers=ann["auth"])
+    block(client, direction, ann, bob)
+    assert [c["id"] for c in client.get("/contacts", headers=ann["auth"]).json()["contacts"]] == [cat["id"]]
+    assert [c["id"] for c in client.get("/contacts", headers=bob["auth"]).json()["contacts"]] == [cat["id"]]
+
+@pytest.mark.parametrize("direction", DIRECTIONS)
+def test_non_members_filtered(client, people, direction):
+    ann, bob, cat = people
+    block(client, direction, ann, bob)
+    for owner, other in ((ann, bob), (bob, ann)):
+        group_id = client.post("/groups/create", json={"name": "Squad"}, headers=owner["auth"]).json()["group"]["id"]
+        non_members = client.get(f"/groups/{group_id}/messages", headers=owner["auth"]).json()["non_members"]
+        assert [n["id"] for n in non_members] == [cat["id"]]
+
+@pytest.mark.parametrize("direction", DIRECTIONS)
+def test_search_filters_blocked(client, people, direction):
+    ann, bob, cat = people
+    block(client, direction, ann, bob)
+    assert client.get("/users/search?q=bob", headers=ann["auth"]).json()["users"] == []
+    assert client.get("/users/search?q=ann", headers=bob["auth"]).json()["users"] == []
+    assert [u["id"] for u in client.get("/users/search?q=bob", headers=cat["auth"]).json()["users"]] == [bob["id"]]
+
+# ── Unblock and lazy load ─────────────────────────────────────────────
+@pytest.mark.parametrize("direction", DIRECTIONS)
+def test_unblock(client, people, direction):
+    ann, bob, _ = people
+    blocker, target = block(client, direction, ann, bob)
+    assert client.post(f"/contacts/{blocker['id']}/unblock", headers=target["auth"]).status_code == 404
+    assert client.post(f"/contacts/{target['id']}/unblock", headers=blocker["auth"]).status_code == 200
+    assert client.post(f"/contacts/{target['id']}/unblock", headers=blocker["auth"]).status_code == 404
+    # Blocking dropped the blocker's contact row; the target still has theirs and can message again
+    r = client.post("/messages/send", json={"receiver_id": blocker["id"], "text": "hi again"}, headers=target["auth"])
+    assert r.status_code == 200
+    assert blocker["id"] in [c["id"] for c in client.get("/contacts", headers=target["auth"]).json()["contacts"]]
+
+def test_unblock_keeps_reverse_block(client, people):
+    ann, bob, _ = people
+    block(client, "a_blocks_b", ann, bob); block(client, "b_blocks_a", ann, bob)
+    client.post(f"/contacts/{bob['id']}/unblock", headers=ann["auth"])
+    assert client.post("/messages/send", json={"receiver_id": ann["id"], "text": "hi"}, headers=bob["auth"]).status_code == 403
+
+@pytest.mark.parametrize("direction", DIRECTIONS)
+def test_block_loaded_lazily_from_db(client, people, direction, monkeypatch):
+    ann, bob, _ = people
+    blocker, target = (ann, bob) if direction == "a_blocks_b" else (bob, ann)
+    conn = sqlite3.connect(main.DB_PATH)
+    conn.execute("INSERT INTO blocked_users (user_id, blocked_id) VALUES (?,?)", (blocker["id"], target["id"]))
+    conn.commit(); conn.close()
+    monkeypatch.setattr(main, "block_index", main.BlockIndex())   # as after a restart: nothing loaded yet
+    assert main.block_index.out is None
+    r = client.post("/messages/send", json={"receiver_id": blocker["id"], "text": "hi"}, headers=target["auth"])
+    assert r.status_code == 403
+    assert main.block_index.out is not None
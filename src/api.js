@@ -22,6 +22,17 @@ export const api = {
     if (!res.ok) throw new Error(data.detail || "Session expired");
     return data;
   },
+  // Several GET routes in one round trip — resolves to their bodies, in order
+  batch: async (token, paths) => {
+    const res  = await fetch(`${API_URL}/batch`, { method:"POST",
+      headers:{"Content-Type":"application/json", Authorization:`Bearer ${token}`},
+      body: JSON.stringify({ requests: paths.map(path => ({ path })) }) });
+    const data = await res.json();
+    if (!res.ok) throw new Error(data.detail || "Failed to load");
+    const failed = data.responses.find(r => r.status !== 200);
+    if (failed) throw new Error(failed.body.detail || `Failed to load ${failed.path}`);
+    return data.responses.map(r => r.body);
+  },
   updateProfile: async (token, updates) => {
     const res  = await fetch(`${API_URL}/profile`, { method:"PUT",
       headers:{"Content-Type":"application/json", Authorization:`Bearer ${token}`},
@@ -44,6 +55,13 @@ export const api = {
     if (!res.ok) throw new Error(data.detail || "Failed to load requests");
     return data;
   },
+  searchUsers: async (token, query, after = 0) => {
+    const res  = await fetch(`${API_URL}/users/search?q=${encodeURIComponent(query)}&after=${after}`,
+      { headers:{ Authorization:`Bearer ${token}` } });
+    const data = await res.json();
+    if (!res.ok) throw new Error(data.detail || "Search failed");
+    return data;
+  },
   respondToRequest: async (token, requestId, action) => {
     const res  = await fetch(`${API_URL}/friends/respond`, { method:"POST",
       headers:{"Content-Type":"application/json", Authorization:`Bearer ${token}`},
@@ -90,6 +108,13 @@ export const api = {
     if (!res.ok) throw new Error(data.detail || "Failed to block");
     return data;
   },
+  unblockUser: async (token, contactId) => {
+    const res  = await fetch(`${API_URL}/contacts/${contactId}/unblock`, { method:"POST",
+      headers:{ Authorization:`Bearer ${token}` } });
+    const data = await res.json();
+    if (!res.ok) throw new Error(data.detail || "Failed to unblock");
+    return data;
+  },
   reportUser: async (token, contactId) => {
     const res  = await fetch(`${API_URL}/contacts/${contactId}/report`, { method:"POST",
       headers:{ Authorization:`Bearer ${token}` } });
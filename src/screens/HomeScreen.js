@@ -78,12 +78,8 @@ export default function HomeScreen({ navigation, route }) {
   const loadAll = async () => {
     if (!token) return;
     try {
-      const [meData, contactsData, groupsData, friendReqData, groupInvData] = await Promise.all([
-        api.me(token),
-        api.getContacts(token),
-        api.getGroups(token),
-        api.getFriendRequests(token),
-        api.getGroupInvites(token),
+      const [meData, contactsData, groupsData, friendReqData, groupInvData] = await api.batch(token, [
+        '/me', '/contacts', '/groups', '/friends/requests', '/groups/invites/pending',
       ]);
 
       // Always refresh profile from server so it's never corrupted
@@ -110,11 +106,8 @@ export default function HomeScreen({ navigation, route }) {
   const pollContacts = async () => {
     if (!token) return;
     try {
-      const [contactsData, groupsData, friendReqData, groupInvData] = await Promise.all([
-        api.getContacts(token),
-        api.getGroups(token),
-        api.getFriendRequests(token),
-        api.getGroupInvites(token),
+      const [contactsData, groupsData, friendReqData, groupInvData] = await api.batch(token, [
+        '/contacts', '/groups', '/friends/requests', '/groups/invites/pending',
       ]);
       setContacts(contactsData.contacts       || []);
       setGroups(groupsData.groups             || []);